@@ -0,0 +1,350 @@
+"""
+PDF Toolkit headless batch mode
+
+Runs any PDFProcessor operation over a directory tree or file list without
+going through HTTP. Uses the same engines as the web app, so outputs match.
+
+    python batch_cli.py compress ./inbox -o ./out --level high --workers 8
+    python batch_cli.py protect --file-list files.txt -o ./out --password secret
+    python batch_cli.py to-images ./scans -o ./png --timeout 300 --memory-mb 2048
+
+A journal in the output folder records every finished file, so an interrupted
+run picks up where it stopped. Files whose content hash was already processed
+with the same options are skipped (or copied from the earlier output).
+"""
+import argparse
+import hashlib
+import importlib.util
+import json
+import multiprocessing
+import os
+import queue
+import shutil
+import sys
+import time
+
+from app import PDFProcessor, STAMP_POSITIONS, COMPRESS_MIN_GAIN, check_number_format
+
+JOURNAL_NAME = '.pdf_toolkit_journal.jsonl'
+
+# Operations that write a folder of files rather than a single PDF
+FOLDER_OUTPUTS = {'split', 'to-images'}
+
+
+def run_operation(operation, input_path, output_path, options):
+    linearize = options['linearize']
+    if operation == 'compress':
+        PDFProcessor.smart_compress_pdf(input_path, output_path, options['level'], linearize, options['min_gain'])
+    elif operation == 'size-target':
+        PDFProcessor.compress_pdf_to_size_smart(input_path, output_path, options['target_size'],
+                                                linearize=linearize, min_gain=options['min_gain'])
+    elif operation == 'optimize':
+        PDFProcessor.optimize_pdf(input_path, output_path, linearize)
+    elif operation == 'split':
+        PDFProcessor.split_pdf(input_path, output_path, options['pages'])
+    elif operation == 'remove':
+        PDFProcessor.remove_pages(input_path, output_path, options['pages'], linearize)
+    elif operation == 'organize':
+        PDFProcessor.organize_pages(input_path, output_path, options['pages'], linearize)
+    elif operation == 'to-images':
+        PDFProcessor.pdf_to_images(input_path, output_path, options['format'], options['dpi'])
+    elif operation == 'stamp':
+        PDFProcessor.stamp_pdf(input_path, output_path, options['watermark'], options['number_format'],
+                               options['start_number'], options['position'], linearize=linearize)
+    elif operation == 'protect':
+        PDFProcessor.protect_pdf(input_path, output_path, options['password'])
+    elif operation == 'unlock':
+        if not PDFProcessor.unlock_pdf(input_path, output_path, options['password']):
+            raise RuntimeError('Wrong password or unreadable PDF')
+    else:
+        raise ValueError(f"Unknown operation: {operation}")
+
+
+def _output_bytes(path):
+    if os.path.isdir(path):
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def _worker(operation, input_path, output_path, options, memory_mb, results, task_id):
+    """Child process: apply limits, run one file, report back"""
+    if memory_mb:
+        # Unix only; main() rejects --memory-mb where it is missing
+        import resource
+        limit = memory_mb * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    start = time.perf_counter()
+    try:
+        if operation in FOLDER_OUTPUTS:
+            os.makedirs(output_path, exist_ok=True)
+        run_operation(operation, input_path, output_path, options)
+        if not os.path.exists(output_path):
+            raise RuntimeError('Operation produced no output')
+        results.put((task_id, {
+            'status': 'ok',
+            'seconds': round(time.perf_counter() - start, 3),
+            'output_bytes': _output_bytes(output_path)
+        }))
+    except MemoryError:
+        results.put((task_id, {'status': 'failed', 'error': f'memory limit of {memory_mb} MB exceeded'}))
+    except Exception as e:
+        results.put((task_id, {'status': 'failed', 'error': str(e)}))
+
+
+def file_digest(path):
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def collect_inputs(paths, file_list):
+    """Return (input_path, path relative to its root) for every PDF requested"""
+    inputs = []
+    if file_list:
+        with open(file_list) as f:
+            paths = list(paths) + [line.strip() for line in f if line.strip()]
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.lower().endswith('.pdf'):
+                        full_path = os.path.join(root, name)
+                        inputs.append((full_path, os.path.relpath(full_path, path)))
+        elif os.path.isfile(path):
+            inputs.append((path, os.path.basename(path)))
+        else:
+            print(f"Skipping missing path: {path}", file=sys.stderr)
+    return inputs
+
+
+def output_path_for(output_dir, relative_path, operation):
+    if operation in FOLDER_OUTPUTS:
+        return os.path.join(output_dir, os.path.splitext(relative_path)[0])
+    return os.path.join(output_dir, relative_path)
+
+
+class Journal:
+    """Append-only JSONL record of finished files, fsynced so it survives crashes"""
+    def __init__(self, path):
+        self.path = path
+        self.by_digest = {}
+        self.by_input = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn final line from a crash
+                    if entry.get('status') == 'ok':
+                        self.by_digest[(entry['sha256'], entry['signature'])] = entry
+                        self.by_input[(entry['input'], entry['signature'])] = entry
+        self.file = open(path, 'a')
+
+    def lookup_by_stat(self, input_path, signature):
+        """Fast path: same file, same size and mtime as a finished entry, no hashing needed"""
+        entry = self.by_input.get((os.path.abspath(input_path), signature))
+        if entry is None:
+            return None
+        stat = os.stat(input_path)
+        if entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime and os.path.exists(entry['output']):
+            return entry
+        return None
+
+    def lookup_by_digest(self, digest, signature):
+        entry = self.by_digest.get((digest, signature))
+        if entry and os.path.exists(entry['output']):
+            return entry
+        return None
+
+    def record(self, entry):
+        self.file.write(json.dumps(entry) + '\n')
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        if entry['status'] == 'ok':
+            self.by_digest[(entry['sha256'], entry['signature'])] = entry
+            self.by_input[(entry['input'], entry['signature'])] = entry
+
+    def close(self):
+        self.file.close()
+
+
+def copy_output(source, destination):
+    if os.path.isdir(source):
+        shutil.copytree(source, destination, dirs_exist_ok=True)
+    else:
+        os.makedirs(os.path.dirname(destination) or '.', exist_ok=True)
+        shutil.copy2(source, destination)
+
+
+def run_batch(args):
+    options = {
+        'level': args.level,
+        'target_size': args.target_size,
+        'min_gain': args.min_gain,
+        'pages': args.pages,
+        'format': args.format,
+        'dpi': args.dpi,
+        'linearize': args.linearize,
+        'watermark': args.watermark,
+        'number_format': args.number_format,
+        'start_number': args.start_number,
+        'position': args.position,
+        'password': args.password
+    }
+    # The journal only ever sees a slow salted fingerprint of the password
+    fingerprint = None
+    if args.password:
+        fingerprint = hashlib.pbkdf2_hmac('sha256', args.password.encode(), b'pdf-toolkit-journal', 200000).hex()[:16]
+    signature = json.dumps({'operation': args.operation, 'password': fingerprint,
+                            **{k: v for k, v in options.items() if k != 'password'}}, sort_keys=True)
+
+    os.makedirs(args.output, exist_ok=True)
+    journal = Journal(os.path.join(args.output, JOURNAL_NAME))
+    inputs = collect_inputs(args.inputs, args.file_list)
+    print(f"{len(inputs)} PDF(s) queued for '{args.operation}' on {args.workers} worker(s)")
+
+    context = multiprocessing.get_context('fork' if hasattr(os, 'fork') else 'spawn')
+    results = context.Queue()
+    pending = list(enumerate(inputs))
+    running = {}
+    stats = {'ok': 0, 'failed': 0, 'skipped': 0, 'bytes_in': 0, 'bytes_out': 0}
+    started = time.time()
+    last_report = 0
+
+    def finish(task_id, outcome):
+        if task_id not in running:
+            return  # already settled, e.g. a timed-out worker that reported late
+        process, input_path, output_path, digest, deadline = running.pop(task_id)
+        process.join()
+        stat = os.stat(input_path)
+        entry = {
+            'input': os.path.abspath(input_path),
+            'output': os.path.abspath(output_path),
+            'sha256': digest,
+            'signature': signature,
+            'size': stat.st_size,
+            'mtime': stat.st_mtime,
+            **outcome
+        }
+        journal.record(entry)
+        if outcome['status'] == 'ok':
+            stats['ok'] += 1
+            stats['bytes_in'] += stat.st_size
+            stats['bytes_out'] += outcome['output_bytes']
+        else:
+            stats['failed'] += 1
+            print(f"FAILED {input_path}: {outcome['error']}", file=sys.stderr)
+
+    try:
+        while pending or running:
+            # Fill free worker slots
+            while pending and len(running) < args.workers:
+                task_id, (input_path, relative_path) = pending.pop(0)
+                output_path = output_path_for(args.output, relative_path, args.operation)
+
+                if journal.lookup_by_stat(input_path, signature):
+                    stats['skipped'] += 1
+                    continue
+                digest = file_digest(input_path)
+                previous = journal.lookup_by_digest(digest, signature)
+                if previous:
+                    if os.path.abspath(output_path) != previous['output']:
+                        copy_output(previous['output'], output_path)
+                    stats['skipped'] += 1
+                    continue
+
+                os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+                process = context.Process(target=_worker, args=(
+                    args.operation, input_path, output_path, options, args.memory_mb, results, task_id))
+                process.start()
+                deadline = time.time() + args.timeout if args.timeout else None
+                running[task_id] = (process, input_path, output_path, digest, deadline)
+
+            try:
+                task_id, outcome = results.get(timeout=0.5)
+                finish(task_id, outcome)
+            except queue.Empty:
+                pass
+
+            # Enforce timeouts and notice children that died without reporting (e.g. OOM kill)
+            now = time.time()
+            for task_id, (process, _, _, _, deadline) in list(running.items()):
+                if deadline and now > deadline and process.is_alive():
+                    process.terminate()
+                    finish(task_id, {'status': 'failed', 'error': f'timed out after {args.timeout}s'})
+                elif not process.is_alive() and process.exitcode not in (0, None):
+                    finish(task_id, {'status': 'failed', 'error': f'worker exited with code {process.exitcode}'})
+
+            done = stats['ok'] + stats['failed'] + stats['skipped']
+            if done - last_report >= 50:
+                last_report = done
+                elapsed = time.time() - started
+                print(f"  {done}/{len(inputs)} files, {stats['ok'] / elapsed:.2f} files/s")
+    except KeyboardInterrupt:
+        print("Interrupted - rerun the same command to resume", file=sys.stderr)
+        for process, *_ in running.values():
+            process.terminate()
+        return 130
+    finally:
+        journal.close()
+
+    elapsed = max(time.time() - started, 1e-9)
+    mb_in = stats['bytes_in'] / (1024 * 1024)
+    print(f"Done in {elapsed:.1f}s: {stats['ok']} ok, {stats['failed']} failed, {stats['skipped']} skipped")
+    print(f"Throughput: {stats['ok'] / elapsed:.2f} files/s, {mb_in / elapsed:.2f} MB/s in")
+    if stats['bytes_in']:
+        print(f"Size: {mb_in:.2f} MB -> {stats['bytes_out'] / (1024 * 1024):.2f} MB")
+    return 1 if stats['failed'] else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run a PDF Toolkit operation over many files')
+    parser.add_argument('operation', choices=['compress', 'size-target', 'optimize', 'split', 'remove',
+                                              'organize', 'to-images', 'stamp', 'protect', 'unlock'])
+    parser.add_argument('inputs', nargs='*', help='PDF files or directories (searched recursively)')
+    parser.add_argument('--file-list', help='text file with one input path per line')
+    parser.add_argument('-o', '--output', required=True, help='output directory (mirrors input layout)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--timeout', type=float, default=0, help='per-file timeout in seconds (0 = none)')
+    parser.add_argument('--memory-mb', type=int, default=0, help='per-file address space limit (0 = none)')
+    parser.add_argument('--level', default='medium', choices=['low', 'medium', 'high', 'extreme', 'scan'])
+    parser.add_argument('--target-size', type=float, default=2.0, help='MB, for size-target')
+    parser.add_argument('--min-gain', type=float, default=COMPRESS_MIN_GAIN,
+                        help='keep the original when compression is expected to save less than this fraction')
+    parser.add_argument('--pages', default='all', help='pages for split/remove/organize, e.g. "1-3, 5"')
+    parser.add_argument('--format', default='png', choices=['png', 'jpg'], help='for to-images')
+    parser.add_argument('--dpi', type=int, default=150, help='for to-images')
+    parser.add_argument('--watermark', help='diagonal watermark text, for stamp')
+    parser.add_argument('--number-format', help='page/Bates number text for stamp, e.g. "ACME-{n:06d}"')
+    parser.add_argument('--start-number', type=int, default=1, help='first {n} in --number-format')
+    parser.add_argument('--position', default='bottom-right', choices=STAMP_POSITIONS, help='for stamp numbers')
+    parser.add_argument('--password', help='for protect/unlock')
+    parser.add_argument('--linearize', action='store_true',
+                        help='fast web view output for compress, size-target, optimize, remove, organize and stamp')
+    args = parser.parse_args(argv)
+
+    if not args.inputs and not args.file_list:
+        parser.error('give input paths or --file-list')
+    if args.operation in ('protect', 'unlock') and not args.password:
+        parser.error(f"{args.operation} needs --password")
+    if args.operation == 'stamp' and not (args.watermark or args.number_format):
+        parser.error('stamp needs --watermark and/or --number-format')
+    if args.number_format:
+        try:
+            check_number_format(args.number_format)
+        except ValueError as e:
+            parser.error(str(e))
+    if args.operation in ('remove', 'organize') and args.pages == 'all':
+        parser.error(f"{args.operation} needs --pages")
+    if args.memory_mb and importlib.util.find_spec('resource') is None:
+        parser.error('--memory-mb is not supported on this platform')
+    args.workers = max(1, args.workers)
+    return run_batch(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
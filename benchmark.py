@@ -0,0 +1,435 @@
+"""
+PDF Toolkit benchmark suite
+
+Generates a reproducible synthetic corpus with reportlab and times every
+PDFProcessor operation against it. Results are written as JSON and can be
+compared against a stored baseline to flag regressions.
+
+    python benchmark.py                          # run everything, write bench_results.json
+    python benchmark.py --corpus text mixed      # only some corpora
+    python benchmark.py --baseline baseline.json # compare and exit 1 on regression
+"""
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import queue
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+try:
+    import resource
+except ImportError:  # Windows: peak RSS is not measured
+    resource = None
+
+from PIL import Image
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfgen import canvas
+
+from app import PDFProcessor
+
+CORPUS_SEED = 2024
+PAGE_WIDTH, PAGE_HEIGHT = A4
+
+WORDS = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua invoice contract agreement total "
+    "amount section clause party hereby pursuant schedule annex page report"
+).split()
+
+
+def _random_line(rng, words=12):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def _draw_text(c, rng, lines=45):
+    c.setFont('Helvetica', 10)
+    y = PAGE_HEIGHT - 60
+    for _ in range(lines):
+        c.drawString(50, y, _random_line(rng))
+        y -= 16
+
+
+def _scan_image(rng, width=1700, height=2200):
+    """Greyish noisy 'scan' stored as RGB, like a typical office scanner output"""
+    # Noise comes from rng (not Image.effect_noise, which is unseeded) so the corpus is reproducible
+    size = (width // 4, height // 4)
+    base = Image.frombytes('L', size, rng.randbytes(size[0] * size[1]))
+    base = base.resize((width, height)).point(lambda v: 255 if v > 110 else 20)
+    return base.convert('RGB')
+
+
+def _photo_image(rng, width, height):
+    img = Image.radial_gradient('L').resize((width, height))
+    tint = tuple(rng.randint(60, 255) for _ in range(3))
+    return Image.merge('RGB', [img.point(lambda v, t=t: v * t // 255) for t in tint])
+
+
+def _image_reader(img, fmt='JPEG'):
+    buffer = io.BytesIO()
+    img.save(buffer, format=fmt, quality=92)
+    buffer.seek(0)
+    return ImageReader(buffer)
+
+
+def _new_canvas(path):
+    # invariant=1 keeps timestamps and ids fixed so the corpus is byte-identical between runs
+    return canvas.Canvas(path, pagesize=A4, invariant=1)
+
+
+def make_text_only(path, rng, pages=50):
+    c = _new_canvas(path)
+    for _ in range(pages):
+        _draw_text(c, rng)
+        c.showPage()
+    c.save()
+
+
+def make_scans(path, rng, pages=20):
+    c = _new_canvas(path)
+    for _ in range(pages):
+        c.drawImage(_image_reader(_scan_image(rng)), 0, 0, PAGE_WIDTH, PAGE_HEIGHT)
+        c.showPage()
+    c.save()
+
+
+def make_shared_images(path, rng, pages=100, distinct=5):
+    # reportlab reuses one XObject per distinct image, so pages share the same streams
+    logos = [_image_reader(_photo_image(rng, 300, 300), 'PNG') for _ in range(distinct)]
+    c = _new_canvas(path)
+    for page in range(pages):
+        _draw_text(c, rng, lines=20)
+        for slot in range(3):
+            logo = logos[(page + slot) % distinct]
+            c.drawImage(logo, 50 + slot * 170, 80, 120, 120)
+        c.showPage()
+    c.save()
+
+
+def make_long_document(path, rng, pages=2000):
+    c = _new_canvas(path)
+    for _ in range(pages):
+        _draw_text(c, rng, lines=30)
+        c.showPage()
+    c.save()
+
+
+def make_mixed(path, rng, pages=40):
+    photo = _image_reader(_photo_image(rng, 1600, 1200))
+    c = _new_canvas(path)
+    for page in range(pages):
+        if page % 4 == 0:
+            c.drawImage(_image_reader(_scan_image(rng)), 0, 0, PAGE_WIDTH, PAGE_HEIGHT)
+        else:
+            _draw_text(c, rng, lines=25)
+            if page % 4 == 1:
+                c.drawImage(photo, 60, 80, 470, 350)
+        c.showPage()
+    c.save()
+
+
+CORPORA = {
+    'text': make_text_only,
+    'scans': make_scans,
+    'shared-images': make_shared_images,
+    'long': make_long_document,
+    'mixed': make_mixed,
+}
+
+
+def generate_corpus(corpus_dir, names):
+    os.makedirs(corpus_dir, exist_ok=True)
+    paths = {}
+    for name in names:
+        path = os.path.join(corpus_dir, f"{name}.pdf")
+        if not os.path.exists(path):
+            print(f"Generating corpus '{name}'...")
+            CORPORA[name](path, random.Random(f"{CORPUS_SEED}-{name}"))
+        paths[name] = path
+    return paths
+
+
+# Each operation takes (input_path, work_dir) and returns the output path (file or folder)
+def _op_merge(input_path, work_dir):
+    output = os.path.join(work_dir, 'merged.pdf')
+    PDFProcessor.merge_pdfs([input_path, input_path], output)
+    return output
+
+
+def _op_split(input_path, work_dir):
+    output = os.path.join(work_dir, 'split')
+    os.makedirs(output)
+    PDFProcessor.split_pdf(input_path, output, 'all')
+    return output
+
+
+def _page_count(input_path):
+    import fitz
+    with fitz.open(input_path) as doc:
+        return len(doc)
+
+
+def _op_remove(input_path, work_dir):
+    # Drop the second half of the document
+    total = _page_count(input_path)
+    output = os.path.join(work_dir, 'removed.pdf')
+    PDFProcessor.remove_pages(input_path, output, f"{total // 2 + 1}-{total}" if total > 1 else '2')
+    return output
+
+
+def _op_organize(input_path, work_dir):
+    # Move the last page to the front
+    total = _page_count(input_path)
+    order = f"{total},1-{total - 1}" if total > 1 else '1'
+    output = os.path.join(work_dir, 'organized.pdf')
+    PDFProcessor.organize_pages(input_path, output, order)
+    return output
+
+
+def _compress_op(level):
+    def run(input_path, work_dir):
+        output = os.path.join(work_dir, f"compressed_{level}.pdf")
+        PDFProcessor.smart_compress_pdf(input_path, output, level)
+        return output
+    return run
+
+
+def _op_size_target(input_path, work_dir):
+    output = os.path.join(work_dir, 'size_target.pdf')
+    target_mb = os.path.getsize(input_path) / (1024 * 1024) / 2
+    PDFProcessor.compress_pdf_to_size_smart(input_path, output, target_mb)
+    return output
+
+
+def _op_to_images(input_path, work_dir):
+    output = os.path.join(work_dir, 'images')
+    os.makedirs(output)
+    PDFProcessor.pdf_to_images(input_path, output, 'png')
+    return output
+
+
+def _op_stamp(input_path, work_dir):
+    output = os.path.join(work_dir, 'stamped.pdf')
+    PDFProcessor.stamp_pdf(input_path, output, 'CONFIDENTIAL', 'BENCH-{n:06d}')
+    return output
+
+
+def _op_protect(input_path, work_dir):
+    output = os.path.join(work_dir, 'protected.pdf')
+    PDFProcessor.protect_pdf(input_path, output, 'benchmark')
+    return output
+
+
+def _setup_unlock(input_path, work_dir):
+    protected = os.path.join(work_dir, 'to_unlock.pdf')
+    PDFProcessor.protect_pdf(input_path, protected, 'benchmark')
+    return protected
+
+
+def _op_unlock(input_path, work_dir):
+    output = os.path.join(work_dir, 'unlocked.pdf')
+    if not PDFProcessor.unlock_pdf(input_path, output, 'benchmark'):
+        raise RuntimeError('unlock_pdf rejected the password')
+    return output
+
+
+# name -> (operation, optional setup producing the real input, pages multiplier for throughput)
+OPERATIONS = {
+    'merge': (_op_merge, None, 2),
+    'split': (_op_split, None, 1),
+    'remove': (_op_remove, None, 1),
+    'organize': (_op_organize, None, 1),
+    'compress-low': (_compress_op('low'), None, 1),
+    'compress-medium': (_compress_op('medium'), None, 1),
+    'compress-high': (_compress_op('high'), None, 1),
+    'compress-extreme': (_compress_op('extreme'), None, 1),
+    'compress-scan': (_compress_op('scan'), None, 1),
+    'size-target': (_op_size_target, None, 1),
+    'to-images': (_op_to_images, None, 1),
+    'stamp': (_op_stamp, None, 1),
+    'protect': (_op_protect, None, 1),
+    'unlock': (_op_unlock, _setup_unlock, 1),
+}
+
+
+# Smallest absolute increase that can count as a regression, per metric
+MIN_DELTAS = {'wall_time_s': 0.05, 'peak_rss_mb': 5.0, 'output_bytes': 0}
+
+
+def _output_size(path):
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+
+def _run_operation(op_name, input_path, result_queue):
+    """Runs in a fresh process so peak RSS belongs to this operation alone"""
+    operation, setup, _ = OPERATIONS[op_name]
+    work_dir = tempfile.mkdtemp(prefix='pdfbench_')
+    try:
+        if setup is not None:
+            input_path = setup(input_path, work_dir)
+        start = time.perf_counter()
+        output = operation(input_path, work_dir)
+        wall_time = time.perf_counter() - start
+        # A run that writes nothing is broken, not fast; record it as an error so it shows as a regression
+        output_bytes = _output_size(output)
+        if not output_bytes:
+            raise RuntimeError(f"{op_name} produced no output")
+        result_queue.put({
+            'wall_time_s': round(wall_time, 4),
+            'peak_rss_mb': _peak_rss_mb(),
+            'output_bytes': output_bytes,
+        })
+    except Exception as e:
+        result_queue.put({'error': str(e)})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _collect_result(process, result_queue, timeout):
+    """Wait for the child's result without hanging on a crashed or runaway process"""
+    deadline = time.time() + timeout if timeout else None
+    while True:
+        try:
+            return result_queue.get(timeout=1)
+        except queue.Empty:
+            pass
+        if not process.is_alive():
+            # It may have put its result just before exiting
+            try:
+                return result_queue.get(timeout=1)
+            except queue.Empty:
+                return {'error': f"worker exited with code {process.exitcode}"}
+        if deadline and time.time() > deadline:
+            process.kill()
+            return {'error': f"timed out after {timeout}s"}
+
+
+def run_benchmarks(corpus_paths, op_names, repeat, timeout=0):
+    # spawn gives every run a clean interpreter, so peak RSS excludes corpus generation
+    context = multiprocessing.get_context('spawn')
+    results = {}
+    for corpus_name, path in corpus_paths.items():
+        page_count = _page_count(path)
+        input_bytes = os.path.getsize(path)
+
+        for op_name in op_names:
+            runs = []
+            for _ in range(repeat):
+                result_queue = context.Queue()
+                process = context.Process(target=_run_operation, args=(op_name, path, result_queue))
+                process.start()
+                runs.append(_collect_result(process, result_queue, timeout))
+                process.join()
+
+            key = f"{corpus_name}/{op_name}"
+            errors = [run['error'] for run in runs if 'error' in run]
+            if errors:
+                results[key] = {'error': errors[0]}
+                print(f"{key:32s} ERROR {errors[0]}")
+                continue
+
+            # Best-of-N wall time filters scheduler noise; RSS and size are deterministic enough
+            best = min(runs, key=lambda run: run['wall_time_s'])
+            pages_processed = page_count * OPERATIONS[op_name][2]
+            results[key] = {
+                'pages': page_count,
+                'input_bytes': input_bytes,
+                'wall_time_s': best['wall_time_s'],
+                'peak_rss_mb': max((run['peak_rss_mb'] for run in runs if run['peak_rss_mb'] is not None),
+                                   default=None),
+                'output_bytes': best['output_bytes'],
+                'pages_per_second': round(pages_processed / best['wall_time_s'], 2) if best['wall_time_s'] else None,
+            }
+            rss = results[key]['peak_rss_mb']
+            rss_text = f"{rss:8.1f}" if rss is not None else f"{'n/a':>8}"
+            print(f"{key:32s} {best['wall_time_s']:8.3f}s {rss_text} MB RSS "
+                  f"{best['output_bytes'] / 1024:10.1f} KB out")
+    return results
+
+
+def compare_to_baseline(results, baseline, threshold, min_deltas=None):
+    """Return a list of human-readable regressions versus the baseline results"""
+    # Absolute changes below these are noise, however large relative to a tiny baseline
+    min_deltas = min_deltas or MIN_DELTAS
+    regressions = []
+    metrics = (('wall_time_s', 'time'), ('peak_rss_mb', 'peak RSS'), ('output_bytes', 'output size'))
+    for key, current in results.items():
+        previous = baseline.get(key)
+        if not previous or 'error' in previous:
+            continue
+        if 'error' in current:
+            regressions.append(f"{key}: now fails ({current['error']})")
+            continue
+        for metric, label in metrics:
+            old, new = previous.get(metric), current.get(metric)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            if change > threshold and new - old >= min_deltas.get(metric, 0):
+                regressions.append(f"{key}: {label} {old} -> {new} (+{change:.0%})")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark PDFProcessor operations on a synthetic corpus')
+    parser.add_argument('--corpus', nargs='+', choices=sorted(CORPORA), default=list(CORPORA),
+                        help='corpora to run (default: all)')
+    parser.add_argument('--operations', nargs='+', choices=list(OPERATIONS), default=list(OPERATIONS),
+                        help='operations to run (default: all)')
+    parser.add_argument('--corpus-dir', default='bench_corpus', help='where generated PDFs are cached')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per operation, best time is kept')
+    parser.add_argument('--output', default='bench_results.json', help='JSON results file')
+    parser.add_argument('--baseline', help='baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='relative increase counted as a regression (default: 0.10)')
+    parser.add_argument('--min-time-delta', type=float, default=MIN_DELTAS['wall_time_s'],
+                        help='seconds a slowdown must also exceed to count (default: 0.05)')
+    parser.add_argument('--timeout', type=float, default=600,
+                        help='seconds before a single run is killed (0 = none)')
+    args = parser.parse_args(argv)
+
+    corpus_paths = generate_corpus(args.corpus_dir, args.corpus)
+    results = run_benchmarks(corpus_paths, args.operations, max(1, args.repeat), args.timeout)
+
+    report = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'results': results,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare_to_baseline(results, baseline, args.threshold,
+                                          dict(MIN_DELTAS, wall_time_s=args.min_time_delta))
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"No regressions against {args.baseline}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
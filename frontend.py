@@ -0,0 +1,367 @@
+"""
+PDF Toolkit async front end
+
+Serves the same Flask app and /api/* routes, but puts an asyncio HTTP/1.1
+layer in front of it. Uploads are read into a spooled buffer on the event
+loop, and a request only reaches a worker thread once it has fully arrived.
+Files from send_file go back out from the event loop too. A client on a slow
+mobile link therefore ties up a socket, not a worker that could be
+compressing.
+
+    python frontend.py --port 5000 --workers 4
+
+Streaming bodies (SSE progress, batch ZIPs, NDJSON text) come from
+generators. Each chunk is produced on a separate stream pool and written
+before the next one is requested, so a slow reader only pauses its own
+generator. Job progress streams wait for the job to change on the event
+loop, so an open progress page holds no thread between events.
+"""
+import argparse
+import asyncio
+import contextvars
+import json
+import os
+import sys
+import tempfile
+import traceback
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from werkzeug.wsgi import FileWrapper
+
+from app import app, cleanup_folder, get_static_assets, max_body_size
+
+READ_CHUNK = 64 * 1024
+# Uploads past this size are buffered on disk instead of in memory
+SPOOL_MEMORY = 1024 * 1024
+HEADER_LIMIT = 64 * 1024
+HEADER_TIMEOUT = 30
+KEEP_ALIVE_TIMEOUT = 75
+# Idle progress streams send a keepalive comment this often
+EVENT_KEEPALIVE = 15
+# Give up on an upload or download that makes no progress for this long
+STALL_TIMEOUT = 120
+
+
+class BufferedFile(FileWrapper):
+    """wsgi.file_wrapper: file responses come back to the event loop to be sent"""
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+async def read_head(reader):
+    """Request line and headers, or None when the client closed an idle connection"""
+    try:
+        head = await reader.readuntil(b'\r\n\r\n')
+    except asyncio.IncompleteReadError as e:
+        if not e.partial.strip():
+            return None
+        raise HTTPError(400, 'Incomplete request head')
+    except asyncio.LimitOverrunError:
+        raise HTTPError(431, 'Request head too large')
+
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, version = lines[0].split(' ')
+    except ValueError:
+        raise HTTPError(400, 'Malformed request line')
+    if version not in ('HTTP/1.0', 'HTTP/1.1'):
+        raise HTTPError(505, 'HTTP version not supported')
+
+    headers = []
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, sep, value = line.partition(':')
+        if not sep or not name or name != name.strip():
+            raise HTTPError(400, 'Malformed header')
+        headers.append((name.lower(), value.strip()))
+    return method, target, version, headers
+
+
+async def _read_exactly(reader, size):
+    try:
+        return await asyncio.wait_for(reader.readexactly(size), STALL_TIMEOUT)
+    except asyncio.IncompleteReadError:
+        raise HTTPError(400, 'Client closed the connection mid-upload')
+
+
+async def read_body(reader, writer, headers, max_body):
+    """Buffer the whole request body without holding a worker; returns (file, size)"""
+    loop = asyncio.get_running_loop()
+    fields = dict(headers)
+    chunked = 'chunked' in fields.get('transfer-encoding', '').lower()
+    length = None if chunked else int(fields.get('content-length') or 0)
+    if length is not None and length > max_body:
+        raise HTTPError(413, 'Upload too large')
+
+    if fields.get('expect', '').lower() == '100-continue' and (chunked or length):
+        writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+        await writer.drain()
+
+    body = tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY)
+    size = 0
+    try:
+        if chunked:
+            while True:
+                line = await asyncio.wait_for(reader.readuntil(b'\r\n'), STALL_TIMEOUT)
+                try:
+                    chunk_size = int(line.split(b';')[0], 16)
+                except ValueError:
+                    raise HTTPError(400, 'Malformed chunked body')
+                if chunk_size == 0:
+                    # Skip any trailers up to the blank line
+                    while (await asyncio.wait_for(reader.readuntil(b'\r\n'), STALL_TIMEOUT)) != b'\r\n':
+                        pass
+                    break
+                size += chunk_size
+                if size > max_body:
+                    raise HTTPError(413, 'Upload too large')
+                while chunk_size:
+                    data = await _read_exactly(reader, min(chunk_size, READ_CHUNK))
+                    # Past SPOOL_MEMORY this is a disk write, which must not stall the loop
+                    await loop.run_in_executor(None, body.write, data)
+                    chunk_size -= len(data)
+                await _read_exactly(reader, 2)
+        else:
+            remaining = length
+            while remaining:
+                data = await _read_exactly(reader, min(remaining, READ_CHUNK))
+                await loop.run_in_executor(None, body.write, data)
+                remaining -= len(data)
+            size = length
+    except BaseException:
+        body.close()
+        raise
+    body.seek(0)
+    return body, size
+
+
+def build_environ(method, target, version, headers, body, size, writer):
+    path, _, query = target.partition('?')
+    server = writer.get_extra_info('sockname') or ('localhost', 0)
+    peer = writer.get_extra_info('peername') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': method,
+        'SCRIPT_NAME': '',
+        # WSGI wants the raw path bytes as latin-1
+        'PATH_INFO': urllib.parse.unquote_to_bytes(path).decode('latin-1'),
+        'QUERY_STRING': query,
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': version,
+        'REMOTE_ADDR': str(peer[0]),
+        'REMOTE_PORT': str(peer[1]),
+        'CONTENT_LENGTH': str(size),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+        'wsgi.file_wrapper': BufferedFile,
+    }
+    for name, value in headers:
+        if name == 'content-type':
+            environ['CONTENT_TYPE'] = value
+        elif name not in ('content-length', 'transfer-encoding'):
+            # The body is already de-chunked, so only its final length is passed on
+            key = 'HTTP_' + name.upper().replace('-', '_')
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+async def wait_for_job(job, version, timeout):
+    """Wait on the event loop until the job's version moves past version, or timeout"""
+    loop = asyncio.get_running_loop()
+    changed = asyncio.Event()
+
+    def listener():
+        loop.call_soon_threadsafe(changed.set)
+
+    job.listeners.add(listener)
+    try:
+        # A finished job will not change again; its stream just has to be read to the end
+        if job.version == version and not job.is_finished:
+            await asyncio.wait_for(changed.wait(), timeout)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        job.listeners.discard(listener)
+
+
+class FrontEnd:
+    def __init__(self, wsgi_app, workers, stream_workers):
+        self.wsgi_app = wsgi_app
+        # Request handlers do the CPU work; stream workers only produce generator chunks
+        self.workers = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='frontend-worker')
+        self.stream_workers = ThreadPoolExecutor(max_workers=stream_workers, thread_name_prefix='frontend-stream')
+
+    def _call_app(self, environ):
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            # Nothing is sent before the app returns, so an error response may always replace the headers
+            response['status'] = status
+            response['headers'] = headers
+            return response.setdefault('written', []).append
+
+        body = self.wsgi_app(environ, start_response)
+        return response['status'], response['headers'], response.get('written', []), body
+
+    async def handle(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        try:
+            timeout = HEADER_TIMEOUT
+            while True:
+                try:
+                    head = await asyncio.wait_for(read_head(reader), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if head is None:
+                    break
+                method, target, version, headers = head
+                connection = dict(headers).get('connection', '').lower()
+                keep_alive = connection == 'keep-alive' if version == 'HTTP/1.0' else connection != 'close'
+
+                # Refuse oversized uploads from the headers, before reading any of the body
+                body, size = await read_body(reader, writer, headers, max_body_size(urllib.parse.unquote(target.partition('?')[0])))
+                try:
+                    environ = build_environ(method, target, version, headers, body, size, writer)
+                    # Job progress routes register their job here instead of blocking a thread on it
+                    watched_jobs = []
+                    environ['pdf_toolkit.watch_job'] = watched_jobs.append
+                    # One context per request, so Flask's stream_with_context generators
+                    # see the same state whichever thread produces their next chunk
+                    context = contextvars.copy_context()
+                    try:
+                        status, response_headers, written, app_iter = await loop.run_in_executor(
+                            self.workers, context.run, self._call_app, environ)
+                    except Exception:
+                        traceback.print_exc()
+                        raise HTTPError(500, 'Internal server error')
+                    keep_alive = await self.send_response(writer, method, version, status, response_headers,
+                                                          written, app_iter, context, keep_alive,
+                                                          watched_jobs[0] if watched_jobs else None)
+                finally:
+                    body.close()
+                if not keep_alive:
+                    break
+                timeout = KEEP_ALIVE_TIMEOUT
+        except HTTPError as e:
+            await self.send_error(writer, e.status, e.message)
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            pass  # client went away or stalled; nothing left to tell it
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def send_response(self, writer, method, version, status, headers, written, app_iter, context, keep_alive,
+                            job=None):
+        """Write one response, streaming the body as the client accepts it; returns whether to keep the connection"""
+        loop = asyncio.get_running_loop()
+        names = {name.lower() for name, _ in headers}
+        status_code = int(status.split(' ', 1)[0])
+        has_body = method != 'HEAD' and status_code not in (204, 304) and status_code >= 200
+        chunked = has_body and 'content-length' not in names and version == 'HTTP/1.1'
+        if has_body and 'content-length' not in names and not chunked:
+            keep_alive = False  # HTTP/1.0 without a length: the end of the body is the close
+
+        head = [f"{version} {status}"] + [f"{name}: {value}" for name, value in headers]
+        if chunked:
+            head.append('Transfer-Encoding: chunked')
+        head.append(f"Connection: {'keep-alive' if keep_alive else 'close'}")
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+
+        async def send(data):
+            if data and has_body:
+                writer.write(b'%x\r\n%s\r\n' % (len(data), data) if chunked else data)
+                # Waiting here for a slow client costs no thread
+                await asyncio.wait_for(writer.drain(), STALL_TIMEOUT)
+
+        try:
+            for data in written:
+                await send(data)
+            if isinstance(app_iter, BufferedFile):
+                # Local disk reads are quick; only the socket side has to wait
+                while True:
+                    data = app_iter.file.read(READ_CHUNK)
+                    if not data:
+                        break
+                    await send(data)
+            elif isinstance(app_iter, (list, tuple)):
+                for data in app_iter:
+                    await send(data)
+            else:
+                iterator = iter(app_iter)
+                seen_version = None
+                while True:
+                    if job is not None:
+                        # The generator does not wait itself, so ask for a chunk only once there is news
+                        if seen_version is not None:
+                            await wait_for_job(job, seen_version, EVENT_KEEPALIVE)
+                        seen_version = job.version
+                    data = await loop.run_in_executor(self.stream_workers, context.run, next, iterator, None)
+                    if data is None:
+                        break
+                    await send(data)
+            if chunked:
+                writer.write(b'0\r\n\r\n')
+            await asyncio.wait_for(writer.drain(), STALL_TIMEOUT)
+        finally:
+            # Generators clean up here (e.g. cancelling batch work for a client that left)
+            if hasattr(app_iter, 'close'):
+                await loop.run_in_executor(self.stream_workers, context.run, app_iter.close)
+        return keep_alive
+
+    async def send_error(self, writer, status, message):
+        body = json.dumps({'error': message}).encode()
+        head = (f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+        try:
+            writer.write(head.encode('latin-1') + body)
+            await asyncio.wait_for(writer.drain(), STALL_TIMEOUT)
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+
+
+async def serve(host, port, workers, stream_workers):
+    frontend = FrontEnd(app, workers, stream_workers)
+    server = await asyncio.start_server(frontend.handle, host, port, limit=HEADER_LIMIT)
+    print(f"PDF Toolkit front end on http://{host}:{port} with {workers} worker(s)")
+    async with server:
+        await server.serve_forever()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve PDF Toolkit behind an asyncio front end')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2,
+                        help='threads running requests once they have fully arrived')
+    parser.add_argument('--stream-workers', type=int, default=64,
+                        help='threads producing chunks of streamed responses (SSE, batch ZIPs)')
+    args = parser.parse_args(argv)
+
+    cleanup_folder(app.config['UPLOAD_FOLDER'])
+    cleanup_folder(app.config['PROCESSED_FOLDER'])
+    get_static_assets()
+    try:
+        asyncio.run(serve(args.host, args.port, max(1, args.workers), max(1, args.stream_workers)))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,523 @@
+let currentTool = '';
+let uploadedFiles = [];
+let originalFileSize = 0;
+let totalPages = 0;
+
+function showTool(tool) {
+    currentTool = tool;
+    const toolConfigs = {
+        'merge': { title: 'Merge PDF Files', description: 'Combine multiple PDF files into one document', multiple: true, accept: '.pdf' },
+        'split': { title: 'Split PDF File', description: 'Split a PDF into multiple files or extract specific pages', multiple: false, accept: '.pdf' },
+        'compress': { title: 'Compress PDF', description: 'Smart compression that preserves text quality', multiple: false, accept: '.pdf' },
+        'remove-pages': { title: 'Remove PDF Pages', description: 'Delete specific pages from your PDF', multiple: false, accept: '.pdf' },
+        'organize': { title: 'Organize PDF Pages', description: 'Reorder pages in your PDF', multiple: false, accept: '.pdf' },
+        'pdf-to-images': { title: 'PDF to Images', description: 'Convert PDF pages to image files (PNG, JPG)', multiple: false, accept: '.pdf' },
+        'images-to-pdf': { title: 'Images to PDF', description: 'Combine JPG and PNG images into one PDF without re-encoding them', multiple: true, accept: '.jpg,.jpeg,.png' },
+        'stamp': { title: 'Watermark & Page Numbers', description: 'Stamp a watermark, page numbers or Bates numbers on every page', multiple: false, accept: '.pdf' },
+        'protect': { title: 'Protect PDF', description: 'Add password protection to your PDF', multiple: false, accept: '.pdf' },
+        'unlock': { title: 'Unlock PDF', description: 'Remove password protection from PDF', multiple: false, accept: '.pdf' }
+    };
+
+    const config = toolConfigs[tool];
+    document.getElementById('tool-title').textContent = config.title;
+    document.getElementById('tool-description').textContent = config.description;
+    document.getElementById('fileInput').multiple = config.multiple;
+    document.getElementById('fileInput').accept = config.accept;
+    showOptions(tool);
+    resetUploadArea();
+}
+
+function showOptions(tool) {
+    const optionsPanel = document.getElementById('options-panel');
+    const optionTemplates = {
+        'split': `
+            <div class="option-group">
+                <label for="pages">Pages to Split:</label>
+                <input type="text" id="pages" placeholder="e.g., 1-3, 5, 7-9 or leave empty for all pages">
+                <small>Separate pages/ranges with commas</small>
+            </div>
+        `,
+        'compress': `
+            <div class="feature-list">
+                <h4>✨ Smart Compression Features:</h4>
+                <ul>
+                    <li>✅ Text preserved as crisp vector data</li>
+                    <li>✅ Only images are compressed</li>
+                    <li>✅ Professional quality like ilovepdf.com</li>
+                    <li>✅ Perfect for documents with text</li>
+                </ul>
+            </div>
+            <div class="compression-method">
+                <div class="method-btn active" onclick="selectCompressionMethod('quality')">Quality Preset</div>
+                <div class="method-btn" onclick="selectCompressionMethod('size')">Exact Size</div>
+            </div>
+            <div id="quality-options">
+                <div class="option-group">
+                    <label for="quality">Compression Level:</label>
+                    <select id="quality">
+                        <option value="low">Low Compression (Best Quality)</option>
+                        <option value="medium" selected>Medium Compression (Recommended)</option>
+                        <option value="high">High Compression (Good Balance)</option>
+                        <option value="extreme">Extreme Compression (Smallest Size)</option>
+                        <option value="scan">Scanned Document (1-bit text, grayscale)</option>
+                    </select>
+                    <small>Higher compression = smaller file but lower image quality</small>
+                </div>
+            </div>
+            <div id="size-options" class="hidden">
+                <div class="option-group">
+                    <label for="target-size">Target File Size (MB):</label>
+                    <input type="number" id="target-size" min="0.1" max="50" step="0.1" value="2.0">
+                    <small>Smart algorithm will find the best balance</small>
+                </div>
+                <div id="size-preview" class="size-preview hidden">
+                    Current: <span id="current-size">0</span> MB → Target: <span id="target-preview">0</span> MB
+                </div>
+            </div>
+            <div class="option-group">
+                <label><input type="checkbox" id="linearize" style="width: auto;"> Fast Web View</label>
+                <small>Lets browsers show the first page before the whole file has downloaded</small>
+            </div>
+        `,
+        'remove-pages': `
+            <div class="option-group">
+                <label for="pages-to-remove">Pages to Remove:</label>
+                <input type="text" id="pages-to-remove" placeholder="e.g., 1, 3, 5-8">
+                <small>Separate pages/ranges with commas. Total pages: <span id="total-pages">0</span></small>
+            </div>
+            <div class="page-numbers">
+                <strong>Examples:</strong><br>
+                Remove single pages: 1, 3, 5<br>
+                Remove page ranges: 2-5, 8-10<br>
+                Mixed: 1, 3-5, 7
+            </div>
+        `,
+        'organize': `
+            <div class="option-group">
+                <label for="page-order">New Page Order:</label>
+                <input type="text" id="page-order" placeholder="e.g., 3, 1, 2 or 5-8, 1-4">
+                <small>Specify the new order of pages. Total pages: <span id="total-pages-organize">0</span></small>
+            </div>
+            <div class="page-numbers">
+                <strong>Examples:</strong><br>
+                Reverse order: 3, 2, 1<br>
+                Move pages: 5, 1, 2, 3, 4<br>
+                Use ranges: 5-8, 1-4
+            </div>
+        `,
+        'pdf-to-images': `
+            <div class="option-group">
+                <label for="format">Output Format:</label>
+                <select id="format">
+                    <option value="png">PNG (Best Quality)</option>
+                    <option value="jpg">JPG (Smaller Size)</option>
+                </select>
+            </div>
+        `,
+        'stamp': `
+            <div class="option-group">
+                <label for="watermark">Watermark Text:</label>
+                <input type="text" id="watermark" placeholder="e.g., CONFIDENTIAL (leave empty for none)">
+            </div>
+            <div class="option-group">
+                <label for="number-format">Page Numbers:</label>
+                <input type="text" id="number-format" placeholder="e.g., Page {page} of {total} or ACME-{n:06d}">
+                <small>{page} and {total} count pages; {n} counts from the start number (Bates numbering)</small>
+            </div>
+            <div class="option-group">
+                <label for="start-number">Start Number:</label>
+                <input type="number" id="start-number" min="0" step="1" value="1">
+            </div>
+            <div class="option-group">
+                <label for="position">Number Position:</label>
+                <select id="position">
+                    <option value="bottom-right" selected>Bottom Right</option>
+                    <option value="bottom-center">Bottom Center</option>
+                    <option value="bottom-left">Bottom Left</option>
+                    <option value="top-right">Top Right</option>
+                    <option value="top-center">Top Center</option>
+                    <option value="top-left">Top Left</option>
+                </select>
+            </div>
+        `,
+        'protect': `
+            <div class="option-group">
+                <label for="password">Password:</label>
+                <input type="password" id="password" placeholder="Enter password" required>
+            </div>
+        `,
+        'unlock': `
+            <div class="option-group">
+                <label for="unlock-password">PDF Password:</label>
+                <input type="password" id="unlock-password" placeholder="Enter PDF password" required>
+            </div>
+        `
+    };
+
+    if (optionTemplates[tool]) {
+        optionsPanel.innerHTML = optionTemplates[tool];
+        optionsPanel.classList.remove('hidden');
+
+        // Show quality info for compression
+        if (tool === 'compress') {
+            document.getElementById('quality-info').classList.remove('hidden');
+        } else {
+            document.getElementById('quality-info').classList.add('hidden');
+        }
+    } else {
+        optionsPanel.classList.add('hidden');
+        document.getElementById('quality-info').classList.add('hidden');
+    }
+}
+
+function selectCompressionMethod(method) {
+    document.querySelectorAll('.method-btn').forEach(btn => btn.classList.remove('active'));
+    event.target.classList.add('active');
+
+    if (method === 'quality') {
+        document.getElementById('quality-options').classList.remove('hidden');
+        document.getElementById('size-options').classList.add('hidden');
+    } else {
+        document.getElementById('quality-options').classList.add('hidden');
+        document.getElementById('size-options').classList.remove('hidden');
+        updateSizePreview();
+    }
+}
+
+function updateSizePreview() {
+    if (originalFileSize > 0) {
+        const targetSize = document.getElementById('target-size').value;
+        document.getElementById('current-size').textContent = originalFileSize.toFixed(2);
+        document.getElementById('target-preview').textContent = targetSize;
+        document.getElementById('size-preview').classList.remove('hidden');
+    }
+}
+
+function updatePagePreview(pages) {
+    totalPages = pages;
+    document.getElementById('total-pages').textContent = pages;
+    document.getElementById('total-pages-organize').textContent = pages;
+
+    const pagePreview = document.getElementById('page-preview');
+    pagePreview.innerHTML = `Total pages in document: <strong>${pages}</strong>`;
+    pagePreview.classList.remove('hidden');
+}
+
+const dropZone = document.getElementById('dropZone');
+const fileInput = document.getElementById('fileInput');
+const fileList = document.getElementById('file-list');
+const fileInfo = document.getElementById('file-info');
+const processBtn = document.getElementById('process-btn');
+
+dropZone.addEventListener('click', () => fileInput.click());
+dropZone.addEventListener('dragover', (e) => { e.preventDefault(); dropZone.classList.add('active'); });
+dropZone.addEventListener('dragleave', () => { dropZone.classList.remove('active'); });
+dropZone.addEventListener('drop', (e) => { e.preventDefault(); dropZone.classList.remove('active'); handleFiles(e.dataTransfer.files); });
+
+fileInput.addEventListener('change', (e) => { handleFiles(e.target.files); });
+
+async function handleFiles(files) {
+    uploadedFiles = Array.from(files);
+    updateFileList();
+    updateProcessButton();
+
+    // Show file info for compression
+    if (currentTool === 'compress' && uploadedFiles.length > 0) {
+        originalFileSize = uploadedFiles[0].size / (1024 * 1024);
+        fileInfo.innerHTML = `Original file size: <strong>${originalFileSize.toFixed(2)} MB</strong>`;
+        fileInfo.classList.remove('hidden');
+        updateSizePreview();
+    } else {
+        fileInfo.classList.add('hidden');
+    }
+
+    // Get page count for page-related tools
+    if ((currentTool === 'remove-pages' || currentTool === 'organize' || currentTool === 'split') && uploadedFiles.length > 0) {
+        try {
+            const pageCount = await getPageCount(uploadedFiles[0]);
+            updatePagePreview(pageCount);
+        } catch (error) {
+            console.error('Error getting page count:', error);
+        }
+    }
+}
+
+async function getPageCount(file) {
+    return new Promise((resolve, reject) => {
+        const formData = new FormData();
+        formData.append('file', file);
+
+        fetch('/api/get-page-count', {
+            method: 'POST',
+            body: formData
+        })
+        .then(response => response.json())
+        .then(data => {
+            if (data.page_count) {
+                resolve(data.page_count);
+            } else {
+                reject(new Error('Could not get page count'));
+            }
+        })
+        .catch(reject);
+    });
+}
+
+function updateFileList() {
+    fileList.innerHTML = '';
+    uploadedFiles.forEach((file, index) => {
+        const fileItem = document.createElement('div');
+        fileItem.className = 'file-item';
+        fileItem.innerHTML = `<span>${file.name} (${formatFileSize(file.size)})</span><button onclick="removeFile(${index})">❌</button>`;
+        fileList.appendChild(fileItem);
+    });
+}
+
+function removeFile(index) {
+    uploadedFiles.splice(index, 1);
+    updateFileList();
+    updateProcessButton();
+    fileInfo.classList.add('hidden');
+    document.getElementById('page-preview').classList.add('hidden');
+}
+
+function updateProcessButton() {
+    const minFiles = currentTool === 'merge' ? 2 : 1;
+    processBtn.disabled = uploadedFiles.length < minFiles;
+}
+
+function formatFileSize(bytes) {
+    if (bytes === 0) return '0 Bytes';
+    const k = 1024;
+    const sizes = ['Bytes', 'KB', 'MB', 'GB'];
+    const i = Math.floor(Math.log(bytes) / Math.log(k));
+    return parseFloat((bytes / Math.pow(k, i)).toFixed(2)) + ' ' + sizes[i];
+}
+
+function resetUploadArea() {
+    uploadedFiles = [];
+    fileList.innerHTML = '';
+    fileInfo.classList.add('hidden');
+    document.getElementById('page-preview').classList.add('hidden');
+    document.getElementById('quality-info').classList.add('hidden');
+    processBtn.disabled = true;
+    document.getElementById('progressBar').classList.add('hidden');
+    document.getElementById('progress').style.width = '0%';
+    document.getElementById('progress-status').classList.add('hidden');
+    document.getElementById('cancel-btn').classList.add('hidden');
+    originalFileSize = 0;
+    totalPages = 0;
+}
+
+processBtn.addEventListener('click', processFiles);
+
+let currentJobId = null;
+const cancelBtn = document.getElementById('cancel-btn');
+cancelBtn.addEventListener('click', () => {
+    if (currentJobId) fetch(`/api/jobs/${currentJobId}/cancel`, { method: 'POST' });
+});
+
+function showJobProgress(job) {
+    document.getElementById('progress').style.width = job.percent + '%';
+    const status = document.getElementById('progress-status');
+    const details = job.details || {};
+    let text = `${job.stage || job.status}`;
+    if (details.total) text += `: ${details.done} / ${details.total}`;
+    if (details.images_recompressed) text += ` · ${details.images_recompressed} images recompressed`;
+    if (details.iteration) text += ` · size-target pass ${details.iteration} (${details.level})`;
+    if (job.eta_seconds !== null && job.eta_seconds !== undefined) text += ` · about ${Math.ceil(job.eta_seconds)}s left`;
+    status.textContent = text;
+    status.classList.remove('hidden');
+}
+
+// Follow a background job over server-sent events until it finishes
+function waitForJob(job) {
+    currentJobId = job.job_id;
+    cancelBtn.classList.remove('hidden');
+    return new Promise((resolve, reject) => {
+        const events = new EventSource(`/api/jobs/${job.job_id}/events`);
+        const finish = (callback, value) => {
+            events.close();
+            currentJobId = null;
+            cancelBtn.classList.add('hidden');
+            callback(value);
+        };
+        events.addEventListener('progress', (e) => showJobProgress(JSON.parse(e.data)));
+        events.addEventListener('done', async (e) => {
+            showJobProgress(JSON.parse(e.data));
+            try {
+                const response = await fetch(`/api/jobs/${job.job_id}/result`);
+                if (!response.ok) throw new Error(`Server error: ${response.status}`);
+                finish(resolve, await response.blob());
+            } catch (error) {
+                finish(reject, error);
+            }
+        });
+        events.addEventListener('failed', (e) => finish(reject, new Error(JSON.parse(e.data).error || 'Processing failed')));
+        events.addEventListener('cancelled', () => finish(reject, new Error('Cancelled')));
+        events.onerror = () => {
+            if (events.readyState === EventSource.CLOSED) finish(reject, new Error('Lost connection to server'));
+        };
+    });
+}
+
+async function processFiles() {
+    const progressBar = document.getElementById('progressBar');
+    const progress = document.getElementById('progress');
+    progressBar.classList.remove('hidden');
+    processBtn.disabled = true;
+
+    try {
+        progress.style.width = '0%';
+        const formData = new FormData();
+
+        if (currentTool === 'merge' || currentTool === 'images-to-pdf') {
+            uploadedFiles.forEach(file => { formData.append('files', file); });
+        } else {
+            if (uploadedFiles.length > 0) {
+                formData.append('file', uploadedFiles[0]);
+            } else {
+                throw new Error('No files uploaded');
+            }
+        }
+
+        const options = getToolOptions();
+        for (const [key, value] of Object.entries(options)) {
+            if (value) formData.append(key, value);
+        }
+        // Ask for a background job so the server can report real progress
+        formData.append('async', '1');
+
+        const endpoint = getEndpoint();
+        console.log('Sending to:', endpoint);
+
+        const response = await fetch(endpoint, { method: 'POST', body: formData });
+
+        if (!response.ok) {
+            const errorText = await response.text();
+            throw new Error(`Server error: ${response.status}`);
+        }
+
+        // Endpoints without job support still answer with the file directly
+        const blob = response.status === 202
+            ? await waitForJob(await response.json())
+            : await response.blob();
+        if (blob.size === 0) throw new Error('Received empty file');
+
+        const url = window.URL.createObjectURL(blob);
+        const a = document.createElement('a');
+        a.href = url;
+        a.download = getDownloadFilename();
+        document.body.appendChild(a);
+        a.click();
+        setTimeout(() => {
+            window.URL.revokeObjectURL(url);
+            document.body.removeChild(a);
+        }, 100);
+
+        progress.style.width = '100%';
+        setTimeout(() => {
+            resetUploadArea();
+            progressBar.classList.add('hidden');
+        }, 2000);
+
+    } catch (error) {
+        console.error('Error:', error);
+        alert('Error processing files: ' + error.message);
+        progressBar.classList.add('hidden');
+        processBtn.disabled = false;
+    }
+}
+
+function getToolOptions() {
+    const options = {};
+    switch(currentTool) {
+        case 'split': 
+            options.pages = document.getElementById('pages')?.value || 'all'; 
+            break;
+        case 'compress': 
+            const method = document.querySelector('.method-btn.active').textContent.includes('Quality') ? 'quality' : 'size';
+            if (method === 'quality') {
+                options.method = 'quality';
+                options.quality = document.getElementById('quality')?.value || 'medium';
+            } else {
+                options.method = 'size';
+                options.target_size = document.getElementById('target-size')?.value || '2.0';
+            }
+            options.linearize = document.getElementById('linearize')?.checked ? '1' : '';
+            break;
+        case 'remove-pages':
+            options.pages_to_remove = document.getElementById('pages-to-remove')?.value;
+            if (!options.pages_to_remove) {
+                alert('Please specify which pages to remove');
+                throw new Error('Pages to remove not specified');
+            }
+            break;
+        case 'organize':
+            options.page_order = document.getElementById('page-order')?.value;
+            if (!options.page_order) {
+                alert('Please specify the new page order');
+                throw new Error('Page order not specified');
+            }
+            break;
+        case 'pdf-to-images': 
+            options.format = document.getElementById('format')?.value || 'png'; 
+            break;
+        case 'stamp':
+            options.watermark = document.getElementById('watermark')?.value;
+            options.number_format = document.getElementById('number-format')?.value;
+            if (!options.watermark && !options.number_format) {
+                alert('Please enter a watermark or a page number format');
+                throw new Error('Nothing to stamp');
+            }
+            options.start_number = document.getElementById('start-number')?.value || '1';
+            options.position = document.getElementById('position')?.value || 'bottom-right';
+            break;
+        case 'protect': 
+            options.password = document.getElementById('password')?.value; 
+            break;
+        case 'unlock':
+            options.password = document.getElementById('unlock-password')?.value;
+            break;
+    }
+    return options;
+}
+
+function getEndpoint() {
+    const endpoints = {
+        'merge': '/api/merge',
+        'split': '/api/split', 
+        'compress': '/api/compress',
+        'remove-pages': '/api/remove-pages',
+        'organize': '/api/organize',
+        'pdf-to-images': '/api/pdf-to-images',
+        'images-to-pdf': '/api/images-to-pdf',
+        'stamp': '/api/stamp',
+        'protect': '/api/protect',
+        'unlock': '/api/unlock'
+    };
+    return endpoints[currentTool];
+}
+
+function getDownloadFilename() {
+    const filenames = {
+        'merge': 'merged.pdf',
+        'split': 'split_pages.zip',
+        'compress': 'compressed.pdf', 
+        'remove-pages': 'removed_pages.pdf',
+        'organize': 'reorganized.pdf',
+        'pdf-to-images': 'converted_images.zip',
+        'images-to-pdf': 'images.pdf',
+        'stamp': 'stamped.pdf',
+        'protect': 'protected.pdf',
+        'unlock': 'unlocked.pdf'
+    };
+    return filenames[currentTool];
+}
+
+// Add event listeners
+document.addEventListener('input', function(e) {
+    if (e.target.id === 'target-size') {
+        updateSizePreview();
+    }
+});